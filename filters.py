@@ -1,52 +1,81 @@
-from abc import ABC, abstractmethod
-from typing import List
+from abc import ABC
+from typing import Iterable, List
 
 
 class Filter(ABC):
-    @abstractmethod
-    def filter_starts(self, graph_service, all_starts: List[str]) -> List[str]:
-        """Filter the list of possible start nodes."""
-        pass
+    # Filters are stateless, so they carry no per-instance __dict__
+    __slots__ = ()
 
-    @abstractmethod
-    def filter_ends(self, graph_service, all_ends: List[str]) -> List[str]:
-        """Filter the list of possible end nodes."""
-        pass
+    # Whether path_predicate needs the actual routes. When no active filter does,
+    # the query service skips path enumeration and uses reachability alone.
+    needs_paths = False
 
-    @abstractmethod
-    def filter_paths(self, graph_service, paths: List[List[str]]) -> List[List[str]]:
-        """Filter the list of paths."""
-        pass
+    def start_predicate(self, graph_service, node: str) -> bool:
+        """Return whether a node may start a route."""
+        return True
 
+    def end_predicate(self, graph_service, node: str) -> bool:
+        """Return whether a node may end a route."""
+        return True
 
-class StartPublicFilter(Filter):
-    def filter_starts(self, graph_service, all_starts: List[str]) -> List[str]:
-        return [node for node in all_starts if graph_service.get_node_data(node).get('publicExposed', False)]
+    def path_predicate(self, graph_service, path: List[str]) -> bool:
+        """Return whether a route is kept."""
+        return True
 
-    def filter_ends(self, graph_service, all_ends: List[str]) -> List[str]:
-        return all_ends
+    @staticmethod
+    def combine(filters: Iterable['Filter']) -> 'Filter':
+        """Fuse filters into one whose predicates hold only when all of theirs do."""
+        return CompositeFilter(filters)
 
-    def filter_paths(self, graph_service, paths: List[List[str]]) -> List[List[str]]:
-        return paths
 
+class StartPublicFilter(Filter):
+    __slots__ = ()
 
-class EndSinkFilter(Filter):
-    def filter_starts(self, graph_service, all_starts: List[str]) -> List[str]:
-        return all_starts
+    def start_predicate(self, graph_service, node: str) -> bool:
+        return node in graph_service.public_nodes
 
-    def filter_ends(self, graph_service, all_ends: List[str]) -> List[str]:
-        return [node for node in all_ends if graph_service.get_node_data(node).get('kind') in ['rds', 'sqs']]
 
-    def filter_paths(self, graph_service, paths: List[List[str]]) -> List[List[str]]:
-        return paths
+class EndSinkFilter(Filter):
+    __slots__ = ()
+
+    def end_predicate(self, graph_service, node: str) -> bool:
+        return node in graph_service.sink_nodes
 
 
 class HasVulnFilter(Filter):
-    def filter_starts(self, graph_service, all_starts: List[str]) -> List[str]:
-        return all_starts
+    __slots__ = ()
+    needs_paths = True
+
+    def path_predicate(self, graph_service, path: List[str]) -> bool:
+        return not graph_service.vuln_nodes.isdisjoint(path)
+
+
+class CompositeFilter(Filter):
+    __slots__ = ('filters', 'needs_paths', '_start_preds', '_end_preds', '_path_preds')
+
+    def __init__(self, filters: Iterable[Filter]):
+        self.filters = list(filters)
+        self.needs_paths = any(filter_obj.needs_paths for filter_obj in self.filters)
+        # Keep only the predicates a component overrides; the defaults accept everything
+        self._start_preds = self._overridden('start_predicate')
+        self._end_preds = self._overridden('end_predicate')
+        self._path_preds = self._overridden('path_predicate')
+
+    def _overridden(self, name: str) -> list:
+        return [getattr(filter_obj, name) for filter_obj in self.filters
+                if getattr(type(filter_obj), name) is not getattr(Filter, name)]
+
+    def start_predicate(self, graph_service, node: str) -> bool:
+        return all(pred(graph_service, node) for pred in self._start_preds)
+
+    def end_predicate(self, graph_service, node: str) -> bool:
+        return all(pred(graph_service, node) for pred in self._end_preds)
+
+    def path_predicate(self, graph_service, path: List[str]) -> bool:
+        return all(pred(graph_service, path) for pred in self._path_preds)
 
-    def filter_ends(self, graph_service, all_ends: List[str]) -> List[str]:
-        return all_ends
 
-    def filter_paths(self, graph_service, paths: List[List[str]]) -> List[List[str]]:
-        return [path for path in paths if any('vulnerabilities' in graph_service.get_node_data(node) for node in path)]
\ No newline at end of file
+# Shared instances of the stateless filters
+START_PUBLIC = StartPublicFilter()
+END_SINK = EndSinkFilter()
+HAS_VULN = HasVulnFilter()
\ No newline at end of file
@@ -1,79 +1,176 @@
-from typing import List, Dict, Any
+import atexit
+import multiprocessing
+import os
+from itertools import chain
+from typing import List, Dict, Any, Iterable, Optional, Set, Tuple
 import networkx as nx
+import numpy as np
 from graph_service import GraphService
 from filters import Filter
 
+MERMAID_HEADER = ("graph TD",)
+
+# Class definitions for coloring by rules
+MERMAID_CLASS_DEFS = (
+    "classDef publicExposed fill:#00ff00",
+    "classDef vulnerable fill:#ff0000",
+    "classDef nonService fill:#ffff00",
+    "classDef service fill:#add8e6",
+)
+
+# Below this many (start, end) pairs, shipping work to the pool costs more than it saves
+PARALLEL_PAIR_THRESHOLD = 4096
+
+Edge = Tuple[str, str]
+
+
+def _matching_edges(graph_service: GraphService, combined: Filter, pairs: Iterable[Edge], mask: List[bool],
+                    cutoff: Optional[int]) -> Set[Edge]:
+    # Paths are streamed straight into the edge set; none of them is stored
+    edges = set()
+    for start, end in pairs:
+        for path in graph_service.get_simple_paths(start, end, cutoff=cutoff, mask=mask):
+            if combined.path_predicate(graph_service, path):
+                edges.update(zip(path, path[1:]))
+    return edges
+
+
+# Per-worker state, inherited from the parent when the pool is forked
+_worker_graph_service = None
+
+
+def _init_worker(graph_service: GraphService) -> None:
+    global _worker_graph_service
+    _worker_graph_service = graph_service
+
+
+def _matching_edges_worker(task: Tuple[List[Edge], Filter, List[bool], Optional[int]]) -> Set[Edge]:
+    pairs, combined, mask, cutoff = task
+    return _matching_edges(_worker_graph_service, combined, pairs, mask, cutoff)
+
 
 class GraphQueryService:
     def __init__(self, graph_service: GraphService):
         self.graph_service = graph_service
+        # Read-only view of the whole graph, shared by every unfiltered query
+        self._full_graph = graph_service.graph.subgraph(graph_service.graph.nodes)
+        self._pool = None
+        self._processes = 1
 
-    def get_filtered_graph(self, filters: List[Filter]) -> Dict[str, Any]:
-        all_starts = self.graph_service.get_all_nodes()
-        all_ends = self.graph_service.get_all_nodes()
+    def start_workers(self, processes: Optional[int] = None) -> None:
+        """Fork the long-lived process pool used for large path enumerations.
 
-        # Apply start filters
-        for filter_obj in filters:
-            all_starts = filter_obj.filter_starts(self.graph_service, all_starts)
+        Call this at startup, before the server starts any threads: forking a
+        multi-threaded process can deadlock the children. Without a pool, on a
+        single CPU, where fork is unavailable, or when the graph is too small to
+        ever have PARALLEL_PAIR_THRESHOLD (start, end) pairs, enumeration stays serial.
+        """
+        processes = processes or os.cpu_count() or 1
+        node_count = len(self.graph_service.nodes)
+        if self._pool is not None or processes <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+            return
+        # A pool that no query could ever use would only hold idle forks
+        if node_count * (node_count - 1) < PARALLEL_PAIR_THRESHOLD:
+            return
+        # Workers inherit the loaded graph copy-on-write instead of unpickling it
+        self._pool = multiprocessing.get_context('fork').Pool(
+            processes, initializer=_init_worker, initargs=(self.graph_service,))
+        self._processes = processes
+        atexit.register(self.stop_workers)
 
-        # Apply end filters
-        for filter_obj in filters:
-            all_ends = filter_obj.filter_ends(self.graph_service, all_ends)
+    def stop_workers(self) -> None:
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
 
-        matching_paths = []
-        for start in all_starts:
-            for end in all_ends:
-                if start == end:
-                    continue
-                paths = self.graph_service.get_simple_paths(start, end)
-                matching_paths.extend(paths)
+    def get_filtered_graph(self, filters: List[Filter], max_depth: Optional[int] = None) -> Dict[str, Any]:
+        subgraph = self.compute_subgraph(filters, max_depth)
+        return {**self.render_json(subgraph), "mermaid": self.render_mermaid(subgraph)}
 
-        # Apply path filters
-        for filter_obj in filters:
-            matching_paths = filter_obj.filter_paths(self.graph_service, matching_paths)
+    def compute_subgraph(self, filters: List[Filter], max_depth: Optional[int] = None) -> nx.DiGraph:
+        """Return the read-only subgraph made of the routes matching all filters.
 
+        max_depth limits routes to that many edges. It can only tighten the graph
+        service's default cutoff, which also applies when it is not given.
+        """
+        gs = self.graph_service
         # If no filters, return full graph
         if not filters:
-            subgraph = self.graph_service.graph.copy()
-        else:
-            subgraph = self.graph_service.create_subgraph_from_paths(matching_paths)
-
-        # Build response
-        nodes_list = [{"name": n, **attr} for n, attr in subgraph.nodes(data=True)]
-        edges_list = [{"from": u, "to": v} for u, v in subgraph.edges()]
-
-        # Mermaid
-        mermaid = "graph TD\n"
-        for n in subgraph.nodes():
-            label = n.replace('-', '_')
-            mermaid += f"{label}[{n}]\n"
-        for u, v in subgraph.edges():
-            u_label = u.replace('-', '_')
-            v_label = v.replace('-', '_')
-            mermaid += f"{u_label} --> {v_label}\n"
-
-        # Add class definitions for coloring by rules
-        mermaid += "classDef publicExposed fill:#00ff00\n"
-        mermaid += "classDef vulnerable fill:#ff0000\n"
-        mermaid += "classDef nonService fill:#ffff00\n"
-        mermaid += "classDef service fill:#add8e6\n"
-
-        # Assign classes to nodes
-        for n in subgraph.nodes():
-            node_data = self.graph_service.get_node_data(n)
-            label = n.replace('-', '_')
-            if node_data.get('publicExposed', False):
-                class_name = 'publicExposed'
-            elif 'vulnerabilities' in node_data and node_data['vulnerabilities']:
-                class_name = 'vulnerable'
-            elif node_data.get('kind', 'service') != 'service':
-                class_name = 'nonService'
-            else:
-                class_name = 'service'
-            mermaid += f"class {label} {class_name}\n"
+            return self._full_graph
+
+        combined = Filter.combine(filters)
+        max_depth = gs.default_cutoff if max_depth is None else min(max_depth, gs.default_cutoff)
+
+        # Apply start and end filters in a single pass over the nodes
+        all_starts = []
+        all_ends = []
+        for node in gs.nodes:
+            if combined.start_predicate(gs, node):
+                all_starts.append(node)
+            if combined.end_predicate(gs, node):
+                all_ends.append(node)
+
+        subgraph = gs.reachable_between(all_starts, all_ends, max_depth)
+        # Reachability also admits walks that repeat a node, so a cycle in the
+        # pruned subgraph needs real simple-path enumeration as well
+        if combined.needs_paths or not nx.is_directed_acyclic_graph(subgraph):
+            subgraph = self._filter_paths(combined, subgraph, all_starts, all_ends, max_depth)
+        return subgraph
 
+    def render_json(self, subgraph: nx.DiGraph) -> Dict[str, Any]:
+        """Return the nodes and edges of a subgraph in the response format."""
         return {
-            "nodes": nodes_list,
-            "edges": edges_list,
-            "mermaid": mermaid
-        }
\ No newline at end of file
+            "nodes": [{"name": n, **attr} for n, attr in subgraph.nodes(data=True)],
+            "edges": [{"from": u, "to": v} for u, v in subgraph.edges()]
+        }
+
+    def render_mermaid(self, subgraph: nx.DiGraph) -> str:
+        """Return a Mermaid flowchart of a subgraph, colored by node class."""
+        gs = self.graph_service
+
+        # Classify the whole subgraph at once, then emit each node's
+        # definition and class assignment in the same pass
+        labels = gs.labels
+        nodes = list(subgraph.nodes())
+        idx = np.fromiter((gs.name_to_idx[n] for n in nodes), dtype=np.int64, count=len(nodes))
+        class_names = np.select(
+            [gs.public_exposed[idx], gs.has_vuln[idx], ~gs.kind_is_service[idx]],
+            ['publicExposed', 'vulnerable', 'nonService'],
+            default='service')
+        node_defs = []
+        class_assigns = []
+        for n, class_name in zip(nodes, class_names):
+            label = labels[n]
+            node_defs.append(f"{label}[{n}]")
+            class_assigns.append(f"class {label} {class_name}")
+        edge_defs = (f"{labels[u]} --> {labels[v]}" for u, v in subgraph.edges())
+        return "\n".join(chain(MERMAID_HEADER, node_defs, edge_defs, MERMAID_CLASS_DEFS, class_assigns, ("",)))
+
+    def _filter_paths(self, combined: Filter, pruned: nx.DiGraph, all_starts: List[str],
+                      all_ends: List[str], max_depth: Optional[int]) -> nx.DiGraph:
+        # Enumerate routes only inside the pre-pruned subgraph
+        starts = [n for n in all_starts if n in pruned]
+        ends = [n for n in all_ends if n in pruned]
+        # Only pair each start with the ends it can actually reach
+        end_mask = self.graph_service.end_mask(ends)
+        pairs = [(start, end) for start in starts
+                 for end in self.graph_service.candidate_ends(start, end_mask) if start != end]
+        # Restrict the search to the pruned subgraph, flagged once for all pairs
+        mask = self.graph_service.node_mask(pruned)
+        if self._pool is not None and len(pairs) >= PARALLEL_PAIR_THRESHOLD:
+            edges = self._matching_edges_parallel(combined, pairs, mask, max_depth)
+        else:
+            edges = _matching_edges(self.graph_service, combined, pairs, mask, max_depth)
+        return self.graph_service.graph.edge_subgraph(edges)
+
+    def _matching_edges_parallel(self, combined: Filter, pairs: List[Edge], mask: List[bool],
+                                 max_depth: Optional[int]) -> Set[Edge]:
+        # Pairs are independent and read-only on the graph. Workers filter paths
+        # themselves so only edge sets are sent back.
+        chunksize = max(1, len(pairs) // (4 * self._processes))
+        tasks = ((pairs[i:i + chunksize], combined, mask, max_depth) for i in range(0, len(pairs), chunksize))
+        edges = set()
+        for pair_edges in self._pool.imap_unordered(_matching_edges_worker, tasks):
+            edges |= pair_edges
+        return edges
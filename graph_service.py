@@ -1,55 +1,186 @@
-import json
 import networkx as nx
+import numpy as np
+import orjson
+
+# Upper bound on route length, in edges
+DEFAULT_CUTOFF = 10
 
 
 class GraphService:
     def __init__(self, data_file: str = 'train-ticket.json'):
         self.data_file = data_file
         self.nodes = {}
+        self.labels = {}
+        self.public_nodes = frozenset()
+        self.sink_nodes = frozenset()
+        self.vuln_nodes = frozenset()
         self.graph = nx.DiGraph()
+        self.reach_bits = np.zeros((0, 0), dtype=np.uint64)
+        self.default_cutoff = DEFAULT_CUTOFF
         self._load_data()
 
     def _load_data(self):
-        with open(self.data_file, 'r') as f:
-            data = json.load(f)
+        with open(self.data_file, 'rb') as f:
+            data = orjson.loads(f.read())
 
         self.nodes = {n['name']: n for n in data['nodes']}
-        all_node_names = set(n['name'] for n in data['nodes'])
+        for name, node_data in self.nodes.items():
+            self.graph.add_node(name, **node_data)
+
+        # Edges register any endpoints missing from the node list as they are added
         for e in data['edges']:
-            all_node_names.add(e['from'])
+            from_ = e['from']
             to_list = e['to'] if isinstance(e['to'], list) else [e['to']]
             for to in to_list:
-                all_node_names.add(to)
+                self.graph.add_edge(from_, to)
 
         # Add default attributes for missing nodes
-        for name in all_node_names:
+        for name, attrs in self.graph.nodes(data=True):
             if name not in self.nodes:
                 self.nodes[name] = {'name': name, 'kind': 'service', 'publicExposed': False}
-            self.graph.add_node(name, **self.nodes[name])
+                attrs.update(self.nodes[name])
 
-        for e in data['edges']:
-            from_ = e['from']
-            to_list = e['to'] if isinstance(e['to'], list) else [e['to']]
-            for to in to_list:
-                self.graph.add_edge(from_, to)
+        # Node sets backing the filters, so they reduce to set membership checks
+        self.public_nodes = frozenset(n for n, d in self.nodes.items() if d.get('publicExposed'))
+        self.sink_nodes = frozenset(n for n, d in self.nodes.items() if d.get('kind') in ('rds', 'sqs'))
+        # A node counts as vulnerable for the filter when it has the key, even if the list is empty
+        self.vuln_nodes = frozenset(n for n, d in self.nodes.items() if 'vulnerabilities' in d)
+
+        # Mermaid-safe node ids, computed once instead of on every render
+        self.labels = {name: name.replace('-', '_') for name in self.nodes}
+
+        # Structure-of-arrays view of the attributes used for node classification
+        count = len(self.nodes)
+        self.name_to_idx = {name: i for i, name in enumerate(self.nodes)}
+        self.public_exposed = np.fromiter((bool(d.get('publicExposed', False)) for d in self.nodes.values()),
+                                          dtype=bool, count=count)
+        # Unlike vuln_nodes, coloring only marks nodes with a non-empty vulnerabilities list
+        self.has_vuln = np.fromiter((bool(d.get('vulnerabilities')) for d in self.nodes.values()),
+                                    dtype=bool, count=count)
+        self.kind_is_service = np.fromiter((d.get('kind', 'service') == 'service' for d in self.nodes.values()),
+                                           dtype=bool, count=count)
+
+        # Node names by index. The graph is never mutated after loading, so
+        # get_all_nodes shares this tuple instead of keeping its own copy.
+        self.node_names = tuple(self.nodes)
+
+        # CSR adjacency over node indices for the path enumerator: the successors
+        # of node i are indices[indptr[i]:indptr[i + 1]]
+        self.indptr = [0]
+        self.indices = []
+        for name in self.node_names:
+            self.indices.extend(self.name_to_idx[succ] for succ in self.graph.successors(name))
+            self.indptr.append(len(self.indices))
+
+        self._build_reach_bits()
+
+        # In a DAG no simple path is longer than the longest path, so a shorter
+        # longest path tightens the fixed bound; it never raises it
+        if nx.is_directed_acyclic_graph(self.graph):
+            self.default_cutoff = min(DEFAULT_CUTOFF, nx.dag_longest_path_length(self.graph))
+
+    def _build_reach_bits(self):
+        # Transitive closure as packed bitsets: bit j of row i is set when node j
+        # is reachable from node i (each node counts as reaching itself). Rows are
+        # propagated over the condensation in reverse topological order, so each
+        # strongly connected component is handled once.
+        count = len(self.node_names)
+        words = (count + 63) // 64
+        self.reach_bits = np.zeros((count, words), dtype=np.uint64)
+        condensed = nx.condensation(self.graph)
+        # One member row per component stands for the whole component's closure
+        representative = {}
+        for comp in reversed(list(nx.topological_sort(condensed))):
+            members = [self.name_to_idx[name] for name in condensed.nodes[comp]['members']]
+            row = self._mask_of(members)
+            for succ in condensed.successors(comp):
+                row |= self.reach_bits[representative[succ]]
+            representative[comp] = members[0]
+            self.reach_bits[members] = row
+
+    def _mask_of(self, indices):
+        mask = np.zeros((len(self.node_names) + 63) // 64, dtype=np.uint64)
+        for i in indices:
+            mask[i >> 6] |= np.uint64(1) << np.uint64(i & 63)
+        return mask
+
+    def is_reachable(self, start, end):
+        i = self.name_to_idx[end]
+        return bool((self.reach_bits[self.name_to_idx[start], i >> 6] >> np.uint64(i & 63)) & np.uint64(1))
+
+    def end_mask(self, ends):
+        """Pack a collection of end node names into a bitset for candidate_ends."""
+        return self._mask_of(self.name_to_idx[name] for name in ends)
+
+    def candidate_ends(self, start, end_mask):
+        """Return the nodes of end_mask that are reachable from start."""
+        bits = self.reach_bits[self.name_to_idx[start]] & end_mask
+        flags = np.unpackbits(bits.astype('<u8').view(np.uint8), bitorder='little')[:len(self.node_names)]
+        names = self.node_names
+        return [names[i] for i in np.flatnonzero(flags)]
 
     def get_all_nodes(self):
-        return list(self.graph.nodes())
+        return self.node_names
 
     def get_node_data(self, node):
         return self.nodes.get(node, {})
 
-    def get_simple_paths(self, start, end, cutoff=10):
-        try:
-            return list(nx.all_simple_paths(self.graph, start, end, cutoff=cutoff))
-        except nx.NetworkXNoPath:
-            return []
-
-    def create_subgraph_from_paths(self, paths):
-        subgraph = nx.DiGraph()
-        for path in paths:
-            for i in range(len(path) - 1):
-                subgraph.add_edge(path[i], path[i + 1])
-            for node in path:
-                subgraph.add_node(node, **self.nodes[node])
-        return subgraph
\ No newline at end of file
+    def node_mask(self, names):
+        """Return a per-index boolean mask of the given node names, for get_simple_paths."""
+        mask = [False] * len(self.node_names)
+        for name in names:
+            mask[self.name_to_idx[name]] = True
+        return mask
+
+    def get_simple_paths(self, start, end, cutoff=None, mask=None):
+        # Paths are yielded lazily so callers can filter them without materializing them all.
+        # mask optionally restricts the routes to the nodes flagged by node_mask.
+        if not self.is_reachable(start, end):
+            return
+        if cutoff is None:
+            cutoff = self.default_cutoff
+        names = self.node_names
+        for path in self._simple_path_ids(self.name_to_idx[start], self.name_to_idx[end], cutoff, mask):
+            yield [names[i] for i in path]
+
+    def _simple_path_ids(self, src, dst, cutoff, mask=None):
+        # Iterative DFS over the CSR arrays. Each stack entry is the position of
+        # the next successor to try for the node at the same depth of the path.
+        if cutoff < 1 or src == dst:
+            return
+        indptr, indices = self.indptr, self.indices
+        on_path = [False] * (len(indptr) - 1)
+        on_path[src] = True
+        path = [src]
+        stack = [indptr[src]]
+        while stack:
+            node = path[-1]
+            pos = stack[-1]
+            if pos == indptr[node + 1]:
+                stack.pop()
+                on_path[path.pop()] = False
+                continue
+            stack[-1] = pos + 1
+            succ = indices[pos]
+            if on_path[succ] or (mask is not None and not mask[succ]):
+                continue
+            if succ == dst:
+                yield path + [dst]
+            elif len(path) < cutoff:
+                on_path[succ] = True
+                path.append(succ)
+                stack.append(indptr[succ])
+
+    def reachable_between(self, starts, ends, max_depth=None):
+        # Edges lying on some route from a start to an end, found with one
+        # multi-source BFS forward from the starts and one backward from the ends.
+        # An edge u -> v is on a route of at most max_depth edges (default_cutoff
+        # when not given) when dist(starts, u) + 1 + dist(v, ends) <= max_depth.
+        # This counts walks, so it is exact only when the result has no cycle.
+        limit = self.default_cutoff if max_depth is None else max_depth
+        forward = {n: depth for depth, layer in enumerate(nx.bfs_layers(self.graph, starts)) for n in layer}
+        backward = {n: depth for depth, layer in enumerate(nx.bfs_layers(self.graph.reverse(copy=False), ends))
+                    for n in layer}
+        edges = [(u, v) for u, depth in forward.items() for v in self.graph.successors(u)
+                 if v in backward and depth + 1 + backward[v] <= limit]
+        return self.graph.edge_subgraph(edges)
\ No newline at end of file
@@ -1,42 +1,110 @@
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
+import gzip
+from functools import lru_cache
+from typing import Optional
+import orjson
+from fastapi import FastAPI, Query, Request, Response
+from fastapi.datastructures import Headers
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, ORJSONResponse
 import uvicorn
-from graph_service import GraphService
+from graph_service import GraphService, DEFAULT_CUTOFF
 from graph_query_service import GraphQueryService
-from filters import StartPublicFilter, EndSinkFilter, HasVulnFilter
+from filters import START_PUBLIC, END_SINK, HAS_VULN
 
-app = FastAPI(title="Train Ticket Graph API", description="API for querying the train ticket microservices graph")
+app = FastAPI(title="Train Ticket Graph API", description="API for querying the train ticket microservices graph",
+              default_response_class=ORJSONResponse)
+
+# Bodies smaller than this are not worth compressing
+GZIP_MINIMUM_SIZE = 1024
+
+# Bodies at least GZIP_MINIMUM_SIZE long depend on Accept-Encoding either way
+VARY_HEADERS = {"Vary": "Accept-Encoding"}
+
+# Headers of pre-compressed responses; GZipMiddleware leaves responses that
+# already set Content-Encoding untouched
+GZIP_HEADERS = {"Content-Encoding": "gzip", **VARY_HEADERS}
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    # An explicit gzip entry wins over "*"; a q-value of 0 means "not acceptable"
+    qualities = {}
+    for coding in accept_encoding.split(","):
+        name, *params = coding.split(";")
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.strip().lower()] = quality
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+class QualityAwareGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware that honours q-values such as "gzip;q=0" in Accept-Encoding."""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not _accepts_gzip(Headers(scope=scope).get("accept-encoding", "")):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+# Compresses any other response; the graph endpoints serve pre-compressed cached bodies
+app.add_middleware(QualityAwareGZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE)
 
 # Dependency injection: Instantiate services
 graph_service = GraphService()
 graph_query_service = GraphQueryService(graph_service)
+# Fork the enumeration workers now, before the server starts any threads. This
+# is a no-op unless the graph is large enough for the pool to ever be used.
+graph_query_service.start_workers()
 
-@app.get("/graph")
-def get_graph(start_public: bool = False, end_sink: bool = False, has_vuln_filter: bool = False):
-    """
-    Get filtered graph based on criteria.
-    - start_public: Include routes starting from public services
-    - end_sink: Include routes ending in sinks (rds/sqs)
-    - has_vuln_filter: Include routes that have at least one vulnerable node
-    If no filters are enabled, returns the full graph.
-    """
+# Distinct (filters, max_depth) combinations kept in each response cache
+CACHE_SIZE = 64
+
+def _build_filters(start_public: bool, end_sink: bool, has_vuln_filter: bool):
     filters = []
     if start_public:
-        filters.append(StartPublicFilter())
+        filters.append(START_PUBLIC)
     if end_sink:
-        filters.append(EndSinkFilter())
+        filters.append(END_SINK)
     if has_vuln_filter:
-        filters.append(HasVulnFilter())
+        filters.append(HAS_VULN)
+    return filters
 
-    return graph_query_service.get_filtered_graph(filters)
+def _normalize_max_depth(start_public: bool, end_sink: bool, has_vuln_filter: bool, max_depth: Optional[int]):
+    # Without filters the full graph is returned and max_depth has no effect, so
+    # dropping it keeps those requests on a single cache entry
+    if not (start_public or end_sink or has_vuln_filter):
+        return None
+    return max_depth
 
-@app.get("/graph/html")
-def get_graph_html(start_public: bool = False, end_sink: bool = False, has_vuln_filter: bool = False):
-    """
-    Get the graph as an HTML page with Mermaid diagram.
-    """
-    graph_data = get_graph(start_public, end_sink, has_vuln_filter)
-    html = f"""
+# The graph is loaded once and never mutated, so each query combination is
+# computed once and served from the cache afterwards. The subgraph is shared
+# by both endpoints; each renders only what it needs from it.
+@lru_cache(maxsize=CACHE_SIZE)
+def _cached_subgraph(start_public: bool, end_sink: bool, has_vuln_filter: bool, max_depth: Optional[int]):
+    filters = _build_filters(start_public, end_sink, has_vuln_filter)
+    return graph_query_service.compute_subgraph(filters, max_depth)
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _cached_mermaid(start_public: bool, end_sink: bool, has_vuln_filter: bool, max_depth: Optional[int]) -> str:
+    return graph_query_service.render_mermaid(_cached_subgraph(start_public, end_sink, has_vuln_filter, max_depth))
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _cached_graph_json(start_public: bool, end_sink: bool, has_vuln_filter: bool, max_depth: Optional[int]) -> bytes:
+    graph_data = graph_query_service.render_json(_cached_subgraph(start_public, end_sink, has_vuln_filter, max_depth))
+    graph_data["mermaid"] = _cached_mermaid(start_public, end_sink, has_vuln_filter, max_depth)
+    return orjson.dumps(graph_data)
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _cached_graph_json_gzip(start_public: bool, end_sink: bool, has_vuln_filter: bool, max_depth: Optional[int]) -> bytes:
+    return gzip.compress(_cached_graph_json(start_public, end_sink, has_vuln_filter, max_depth))
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _cached_graph_html(start_public: bool, end_sink: bool, has_vuln_filter: bool, max_depth: Optional[int]) -> bytes:
+    mermaid = _cached_mermaid(start_public, end_sink, has_vuln_filter, max_depth)
+    return f"""
     <!DOCTYPE html>
     <html>
     <head>
@@ -49,12 +117,50 @@ def get_graph_html(start_public: bool = False, end_sink: bool = False, has_vuln_
     <body>
         <h1>Filtered Graph</h1>
         <div class="mermaid">
-{graph_data['mermaid']}
+{mermaid}
         </div>
     </body>
     </html>
+    """.encode()
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _cached_graph_html_gzip(start_public: bool, end_sink: bool, has_vuln_filter: bool, max_depth: Optional[int]) -> bytes:
+    return gzip.compress(_cached_graph_html(start_public, end_sink, has_vuln_filter, max_depth))
+
+@app.get("/graph")
+def get_graph(request: Request, start_public: bool = False, end_sink: bool = False, has_vuln_filter: bool = False,
+              max_depth: Optional[int] = Query(None, ge=1, le=DEFAULT_CUTOFF)):
+    """
+    Get filtered graph based on criteria.
+    - start_public: Include routes starting from public services
+    - end_sink: Include routes ending in sinks (rds/sqs)
+    - has_vuln_filter: Include routes that have at least one vulnerable node
+    - max_depth: Only include routes with at most this many edges
+    If no filters are enabled, returns the full graph.
+    """
+    max_depth = _normalize_max_depth(start_public, end_sink, has_vuln_filter, max_depth)
+    content = _cached_graph_json(start_public, end_sink, has_vuln_filter, max_depth)
+    if len(content) < GZIP_MINIMUM_SIZE:
+        return Response(content=content, media_type="application/json")
+    if _accepts_gzip(request.headers.get("accept-encoding", "")):
+        content = _cached_graph_json_gzip(start_public, end_sink, has_vuln_filter, max_depth)
+        return Response(content=content, media_type="application/json", headers=GZIP_HEADERS)
+    return Response(content=content, media_type="application/json", headers=VARY_HEADERS)
+
+@app.get("/graph/html")
+def get_graph_html(request: Request, start_public: bool = False, end_sink: bool = False,
+                   has_vuln_filter: bool = False, max_depth: Optional[int] = Query(None, ge=1, le=DEFAULT_CUTOFF)):
+    """
+    Get the graph as an HTML page with Mermaid diagram.
     """
-    return HTMLResponse(content=html)
+    max_depth = _normalize_max_depth(start_public, end_sink, has_vuln_filter, max_depth)
+    content = _cached_graph_html(start_public, end_sink, has_vuln_filter, max_depth)
+    if len(content) < GZIP_MINIMUM_SIZE:
+        return HTMLResponse(content=content)
+    if _accepts_gzip(request.headers.get("accept-encoding", "")):
+        content = _cached_graph_html_gzip(start_public, end_sink, has_vuln_filter, max_depth)
+        return HTMLResponse(content=content, headers=GZIP_HEADERS)
+    return HTMLResponse(content=content, headers=VARY_HEADERS)
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
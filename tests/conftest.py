@@ -0,0 +1,27 @@
+import json
+import pytest
+from graph_service import GraphService
+
+
+def chain(count):
+    """Return the nodes and edges of a service-0 -> ... -> service-{count - 1} chain."""
+    names = [f"service-{i}" for i in range(count)]
+    nodes = [{"name": name, "kind": "service", "publicExposed": False} for name in names]
+    edges = [{"from": names[i], "to": [names[i + 1]]} for i in range(count - 1)]
+    return nodes, edges
+
+
+# Tests only read the graph, so it is loaded once for the whole session
+@pytest.fixture(scope="session")
+def graph_service():
+    return GraphService()
+
+
+# Builds a GraphService over a small hand-written graph
+@pytest.fixture
+def make_graph_service(tmp_path):
+    def make(nodes, edges):
+        data_file = tmp_path / "graph.json"
+        data_file.write_text(json.dumps({"nodes": nodes, "edges": edges}))
+        return GraphService(str(data_file))
+    return make
\ No newline at end of file
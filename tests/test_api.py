@@ -1,6 +1,7 @@
 import pytest
+import networkx as nx
 from fastapi.testclient import TestClient
-from main import app
+from main import app, _cached_graph_json
 
 
 client = TestClient(app)
@@ -42,4 +43,81 @@ def test_get_graph_html():
     response = client.get("/graph/html")
     assert response.status_code == 200
     assert "text/html" in response.headers["content-type"]
-    assert "<div class=\"mermaid\">" in response.text
\ No newline at end of file
+    assert "<div class=\"mermaid\">" in response.text
+
+
+def test_get_graph_is_cached():
+    first = client.get("/graph?start_public=true&end_sink=true").json()
+    hits = _cached_graph_json.cache_info().hits
+    second = client.get("/graph?start_public=true&end_sink=true").json()
+    assert _cached_graph_json.cache_info().hits == hits + 1
+    assert first == second
+
+
+def test_get_graph_with_max_depth(graph_service):
+    full = client.get("/graph?end_sink=true").json()
+    response = client.get("/graph?end_sink=true&max_depth=2")
+    assert response.status_code == 200
+    expected_edges = set()
+    for start in graph_service.nodes:
+        for end in graph_service.sink_nodes:
+            if start != end:
+                for path in nx.all_simple_paths(graph_service.graph, start, end, cutoff=2):
+                    expected_edges.update(zip(path, path[1:]))
+    edges = {(e["from"], e["to"]) for e in response.json()["edges"]}
+    assert edges == expected_edges
+    assert len(edges) < len(full["edges"])
+
+
+def test_get_graph_rejects_non_positive_max_depth():
+    response = client.get("/graph?max_depth=0")
+    assert response.status_code == 422
+
+
+def test_get_graph_gzip():
+    response = client.get("/graph", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()["nodes"]) > 0
+
+
+def test_get_graph_without_gzip():
+    response = client.get("/graph", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert len(response.json()["nodes"]) > 0
+
+
+def test_get_graph_gzip_refused_with_zero_quality():
+    response = client.get("/graph", headers={"Accept-Encoding": "gzip;q=0, identity"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert len(response.json()["nodes"]) > 0
+
+
+def test_get_graph_gzip_with_quality_values():
+    response = client.get("/graph", headers={"Accept-Encoding": "deflate;q=1.0, gzip;q=0.5"})
+    assert response.headers["content-encoding"] == "gzip"
+    response = client.get("/graph", headers={"Accept-Encoding": "*;q=0.1"})
+    assert response.headers["content-encoding"] == "gzip"
+
+
+def test_get_graph_html_gzip():
+    response = client.get("/graph/html", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "<div class=\"mermaid\">" in response.text
+
+
+def test_get_graph_rejects_max_depth_above_cutoff():
+    response = client.get("/graph?max_depth=11")
+    assert response.status_code == 422
+
+
+def test_get_graph_without_filters_ignores_max_depth():
+    client.get("/graph")
+    misses = _cached_graph_json.cache_info().misses
+    response = client.get("/graph?max_depth=3")
+    assert response.status_code == 200
+    assert _cached_graph_json.cache_info().misses == misses
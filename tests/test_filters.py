@@ -1,59 +1,43 @@
-import pytest
-from graph_service import GraphService
-from filters import StartPublicFilter, EndSinkFilter, HasVulnFilter
+from filters import Filter, StartPublicFilter, EndSinkFilter, HasVulnFilter, START_PUBLIC, END_SINK, HAS_VULN
 
 
-@pytest.fixture
-def graph_service():
-    return GraphService()
-
-
-def test_start_public_filter_filter_starts(graph_service):
+def test_start_public_filter_start_predicate(graph_service):
     filter_obj = StartPublicFilter()
-    all_starts = graph_service.get_all_nodes()
-    filtered = filter_obj.filter_starts(graph_service, all_starts)
-    # Assuming there are public nodes, check that all filtered are public
-    for node in filtered:
-        assert graph_service.get_node_data(node).get('publicExposed', False) == True
+    for node in graph_service.get_all_nodes():
+        expected = graph_service.get_node_data(node).get('publicExposed', False)
+        assert filter_obj.start_predicate(graph_service, node) == expected
 
 
-def test_start_public_filter_filter_ends(graph_service):
+def test_start_public_filter_end_predicate(graph_service):
     filter_obj = StartPublicFilter()
-    all_ends = graph_service.get_all_nodes()
-    filtered = filter_obj.filter_ends(graph_service, all_ends)
-    assert filtered == all_ends  # Should not filter ends
+    for node in graph_service.get_all_nodes():
+        assert filter_obj.end_predicate(graph_service, node)  # Should not filter ends
 
 
-def test_start_public_filter_filter_paths(graph_service):
+def test_start_public_filter_path_predicate(graph_service):
     filter_obj = StartPublicFilter()
-    paths = [['node1', 'node2'], ['node3', 'node4']]
-    filtered = filter_obj.filter_paths(graph_service, paths)
-    assert filtered == paths  # Should not filter paths
+    assert filter_obj.path_predicate(graph_service, ['node1', 'node2'])  # Should not filter paths
 
 
-def test_end_sink_filter_filter_ends(graph_service):
+def test_end_sink_filter_end_predicate(graph_service):
     filter_obj = EndSinkFilter()
-    all_ends = graph_service.get_all_nodes()
-    filtered = filter_obj.filter_ends(graph_service, all_ends)
-    for node in filtered:
-        assert graph_service.get_node_data(node).get('kind') in ['rds', 'sqs']
+    for node in graph_service.get_all_nodes():
+        expected = graph_service.get_node_data(node).get('kind') in ['rds', 'sqs']
+        assert filter_obj.end_predicate(graph_service, node) == expected
 
 
-def test_end_sink_filter_filter_starts(graph_service):
+def test_end_sink_filter_start_predicate(graph_service):
     filter_obj = EndSinkFilter()
-    all_starts = graph_service.get_all_nodes()
-    filtered = filter_obj.filter_starts(graph_service, all_starts)
-    assert filtered == all_starts
+    for node in graph_service.get_all_nodes():
+        assert filter_obj.start_predicate(graph_service, node)
 
 
-def test_end_sink_filter_filter_paths(graph_service):
+def test_end_sink_filter_path_predicate(graph_service):
     filter_obj = EndSinkFilter()
-    paths = [['node1', 'node2'], ['node3', 'node4']]
-    filtered = filter_obj.filter_paths(graph_service, paths)
-    assert filtered == paths
+    assert filter_obj.path_predicate(graph_service, ['node1', 'node2'])
 
 
-def test_has_vuln_filter_filter_paths(graph_service):
+def test_has_vuln_filter_path_predicate(graph_service):
     filter_obj = HasVulnFilter()
     # Find paths with and without vuln
     vuln_paths = []
@@ -64,21 +48,49 @@ def test_has_vuln_filter_filter_paths(graph_service):
         else:
             no_vuln_paths.append([node])
     all_paths = vuln_paths + no_vuln_paths
-    filtered = filter_obj.filter_paths(graph_service, all_paths)
+    filtered = [path for path in all_paths if filter_obj.path_predicate(graph_service, path)]
     assert len(filtered) == len(vuln_paths)
     for path in filtered:
         assert any('vulnerabilities' in graph_service.get_node_data(n) for n in path)
 
 
-def test_has_vuln_filter_filter_starts(graph_service):
+def test_has_vuln_filter_matches_empty_vulnerabilities(make_graph_service):
+    nodes = [{"name": "a", "kind": "service", "publicExposed": False, "vulnerabilities": []},
+             {"name": "b", "kind": "service", "publicExposed": False}]
+    gs = make_graph_service(nodes, [{"from": "a", "to": ["b"]}])
+    assert HAS_VULN.path_predicate(gs, ["a", "b"])
+    assert not HAS_VULN.path_predicate(gs, ["b"])
+
+
+def test_has_vuln_filter_start_predicate(graph_service):
     filter_obj = HasVulnFilter()
-    all_starts = graph_service.get_all_nodes()
-    filtered = filter_obj.filter_starts(graph_service, all_starts)
-    assert filtered == all_starts
+    for node in graph_service.get_all_nodes():
+        assert filter_obj.start_predicate(graph_service, node)
 
 
-def test_has_vuln_filter_filter_ends(graph_service):
+def test_has_vuln_filter_end_predicate(graph_service):
     filter_obj = HasVulnFilter()
-    all_ends = graph_service.get_all_nodes()
-    filtered = filter_obj.filter_ends(graph_service, all_ends)
-    assert filtered == all_ends
\ No newline at end of file
+    for node in graph_service.get_all_nodes():
+        assert filter_obj.end_predicate(graph_service, node)
+
+
+def test_combine_requires_all_filters(graph_service):
+    combined = Filter.combine([StartPublicFilter(), EndSinkFilter(), HasVulnFilter()])
+    assert combined.needs_paths
+    for node in graph_service.get_all_nodes():
+        assert combined.start_predicate(graph_service, node) == (node in graph_service.public_nodes)
+        assert combined.end_predicate(graph_service, node) == (node in graph_service.sink_nodes)
+        assert combined.path_predicate(graph_service, [node]) == (node in graph_service.vuln_nodes)
+
+
+def test_combine_without_filters_accepts_everything(graph_service):
+    combined = Filter.combine([])
+    assert not combined.needs_paths
+    assert combined.start_predicate(graph_service, 'node1')
+    assert combined.end_predicate(graph_service, 'node1')
+    assert combined.path_predicate(graph_service, ['node1', 'node2'])
+
+
+def test_filters_have_no_instance_dict():
+    for filter_obj in (START_PUBLIC, END_SINK, HAS_VULN, Filter.combine([START_PUBLIC, HAS_VULN])):
+        assert not hasattr(filter_obj, '__dict__')
\ No newline at end of file
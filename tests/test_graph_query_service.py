@@ -0,0 +1,108 @@
+import pytest
+import networkx as nx
+import graph_query_service
+from graph_query_service import GraphQueryService
+from graph_service import DEFAULT_CUTOFF
+from filters import StartPublicFilter, EndSinkFilter, HasVulnFilter
+from tests.conftest import chain
+
+
+@pytest.fixture
+def query_service(graph_service):
+    return GraphQueryService(graph_service)
+
+
+def test_parallel_path_enumeration_matches_serial(graph_service, monkeypatch):
+    query_service = GraphQueryService(graph_service)
+    filters = [StartPublicFilter(), HasVulnFilter()]
+    serial = query_service.get_filtered_graph(filters)
+    monkeypatch.setattr(graph_query_service, 'PARALLEL_PAIR_THRESHOLD', 0)
+    query_service.start_workers(processes=2)
+    try:
+        parallel = query_service.get_filtered_graph(filters)
+    finally:
+        query_service.stop_workers()
+    assert sorted(n['name'] for n in parallel['nodes']) == sorted(n['name'] for n in serial['nodes'])
+    assert sorted((e['from'], e['to']) for e in parallel['edges']) == sorted((e['from'], e['to']) for e in serial['edges'])
+
+
+def test_start_workers_skips_single_cpu(graph_service):
+    query_service = GraphQueryService(graph_service)
+    query_service.start_workers(processes=1)
+    assert query_service._pool is None
+
+
+def test_start_workers_skips_small_graphs(graph_service):
+    # The shipped graph never has PARALLEL_PAIR_THRESHOLD (start, end) pairs
+    query_service = GraphQueryService(graph_service)
+    query_service.start_workers(processes=2)
+    assert query_service._pool is None
+
+
+def test_renderers_match_filtered_graph(query_service):
+    filters = [StartPublicFilter(), HasVulnFilter()]
+    subgraph = query_service.compute_subgraph(filters)
+    expected = query_service.get_filtered_graph(filters)
+    assert query_service.render_json(subgraph) == {"nodes": expected["nodes"], "edges": expected["edges"]}
+    assert query_service.render_mermaid(subgraph) == expected["mermaid"]
+
+
+def test_render_mermaid_full_graph(query_service):
+    subgraph = query_service.compute_subgraph([])
+    mermaid = query_service.render_mermaid(subgraph)
+    assert mermaid.startswith("graph TD\n")
+    for node in subgraph.nodes():
+        assert f"{query_service.graph_service.labels[node]}[{node}]" in mermaid
+
+
+@pytest.mark.parametrize("max_depth", [1, 2, 3, None])
+@pytest.mark.parametrize("has_vuln", [False, True])
+def test_max_depth_limits_routes(query_service, max_depth, has_vuln):
+    gs = query_service.graph_service
+    filters = [StartPublicFilter(), EndSinkFilter()] + ([HasVulnFilter()] if has_vuln else [])
+    subgraph = query_service.compute_subgraph(filters, max_depth)
+    expected_edges = set()
+    for start in gs.public_nodes:
+        for end in gs.sink_nodes:
+            for path in nx.all_simple_paths(gs.graph, start, end, cutoff=max_depth):
+                if not has_vuln or not gs.vuln_nodes.isdisjoint(path):
+                    expected_edges.update(zip(path, path[1:]))
+    assert set(subgraph.edges()) == expected_edges
+
+
+def test_max_depth_cannot_exceed_default_cutoff(make_graph_service):
+    # A 15-node cycle: the only route to the vulnerable node is 14 edges long
+    nodes, edges = chain(15)
+    nodes[0]["publicExposed"] = True
+    nodes[14]["vulnerabilities"] = [{"severity": "high"}]
+    edges.append({"from": "service-14", "to": ["service-0"]})
+    query_service = GraphQueryService(make_graph_service(nodes, edges))
+    assert query_service.graph_service.default_cutoff == DEFAULT_CUTOFF
+    subgraph = query_service.compute_subgraph([StartPublicFilter(), HasVulnFilter()], 40)
+    assert len(subgraph.edges()) == 0
+
+
+def test_endpoint_filters_respect_default_cutoff(make_graph_service):
+    # The only public-to-sink route is 15 edges long, beyond DEFAULT_CUTOFF
+    nodes, edges = chain(16)
+    nodes[0]["publicExposed"] = True
+    nodes[15]["kind"] = "rds"
+    query_service = GraphQueryService(make_graph_service(nodes, edges))
+    assert len(query_service.compute_subgraph([StartPublicFilter(), EndSinkFilter()]).edges()) == 0
+
+
+def test_endpoint_filters_keep_only_simple_routes_on_cycles(make_graph_service):
+    nodes = [{"name": "s", "kind": "service", "publicExposed": True},
+             {"name": "a", "kind": "service", "publicExposed": False},
+             {"name": "b", "kind": "service", "publicExposed": False},
+             {"name": "t", "kind": "rds", "publicExposed": False}]
+    edges = [{"from": "s", "to": ["a"]}, {"from": "a", "to": ["b", "t"]}, {"from": "b", "to": ["a"]}]
+    query_service = GraphQueryService(make_graph_service(nodes, edges))
+    subgraph = query_service.compute_subgraph([StartPublicFilter(), EndSinkFilter()])
+    assert set(subgraph.edges()) == {("s", "a"), ("a", "t")}
+
+
+def test_unfiltered_subgraph_is_read_only(query_service):
+    subgraph = query_service.compute_subgraph([])
+    assert nx.is_frozen(subgraph)
+    assert set(subgraph.edges()) == set(query_service.graph_service.graph.edges())
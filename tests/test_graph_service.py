@@ -1,55 +1,131 @@
 import pytest
-from graph_service import GraphService
+import networkx as nx
+from graph_service import DEFAULT_CUTOFF
+from tests.conftest import chain
 
 
-def test_graph_service_loads_data():
-    gs = GraphService()
-    assert len(gs.nodes) > 0
-    assert len(gs.graph.nodes) > 0
-    assert len(gs.graph.edges) > 0
+def test_graph_service_loads_data(graph_service):
+    assert len(graph_service.nodes) > 0
+    assert len(graph_service.graph.nodes) > 0
+    assert len(graph_service.graph.edges) > 0
 
 
-def test_get_all_nodes():
-    gs = GraphService()
-    nodes = gs.get_all_nodes()
-    assert isinstance(nodes, list)
+def test_get_all_nodes(graph_service):
+    nodes = graph_service.get_all_nodes()
+    assert isinstance(nodes, tuple)
     assert len(nodes) > 0
+    assert graph_service.get_all_nodes() is nodes
 
 
-def test_get_node_data():
-    gs = GraphService()
-    node = gs.get_all_nodes()[0]
-    data = gs.get_node_data(node)
+def test_get_node_data(graph_service):
+    node = graph_service.get_all_nodes()[0]
+    data = graph_service.get_node_data(node)
     assert isinstance(data, dict)
     assert 'name' in data
 
 
-def test_get_simple_paths():
-    gs = GraphService()
-    nodes = gs.get_all_nodes()
+def test_get_simple_paths(graph_service):
+    nodes = graph_service.get_all_nodes()
     if len(nodes) >= 2:
         start = nodes[0]
         end = nodes[1]
-        paths = gs.get_simple_paths(start, end)
-        assert isinstance(paths, list)
+        paths = list(graph_service.get_simple_paths(start, end))
         for path in paths:
             assert isinstance(path, list)
             assert path[0] == start
             assert path[-1] == end
 
 
-def test_create_subgraph_from_paths():
-    gs = GraphService()
-    nodes = gs.get_all_nodes()
-    if len(nodes) >= 3:
-        path1 = [nodes[0], nodes[1]]
-        path2 = [nodes[1], nodes[2]]
-        paths = [path1, path2]
-        subgraph = gs.create_subgraph_from_paths(paths)
-        assert len(subgraph.nodes) >= 2
-        assert len(subgraph.edges) >= 1
-    else:
-        # If not enough nodes, skip or use available
-        paths = [[nodes[0], nodes[1]]] if len(nodes) >= 2 else []
-        subgraph = gs.create_subgraph_from_paths(paths)
-        assert len(subgraph.nodes) >= len(paths)
\ No newline at end of file
+def test_reachable_between(graph_service):
+    starts = [n for n in graph_service.get_all_nodes() if graph_service.get_node_data(n).get('publicExposed', False)]
+    ends = [n for n in graph_service.get_all_nodes() if graph_service.get_node_data(n).get('kind') in ['rds', 'sqs']]
+    subgraph = graph_service.reachable_between(starts, ends)
+    expected_edges = set()
+    for start in starts:
+        for end in ends:
+            if start != end:
+                for path in graph_service.get_simple_paths(start, end):
+                    expected_edges.update(zip(path, path[1:]))
+    assert set(subgraph.edges()) == expected_edges
+
+
+def test_node_attribute_arrays(graph_service):
+    for node, node_data in graph_service.nodes.items():
+        idx = graph_service.name_to_idx[node]
+        assert graph_service.public_exposed[idx] == bool(node_data.get('publicExposed', False))
+        assert graph_service.has_vuln[idx] == bool(node_data.get('vulnerabilities'))
+        assert graph_service.kind_is_service[idx] == (node_data.get('kind', 'service') == 'service')
+
+
+def test_get_simple_paths_matches_networkx(graph_service):
+    nodes = graph_service.get_all_nodes()
+    for start in nodes:
+        for end in nodes:
+            if start == end:
+                continue
+            for cutoff in (2, 10):
+                expected = sorted(nx.all_simple_paths(graph_service.graph, start, end, cutoff=cutoff))
+                assert sorted(graph_service.get_simple_paths(start, end, cutoff=cutoff)) == expected
+
+
+def test_get_simple_paths_unreachable_pair(graph_service):
+    for start in graph_service.get_all_nodes():
+        for end in graph_service.get_all_nodes():
+            if start != end and not nx.has_path(graph_service.graph, start, end):
+                assert list(graph_service.get_simple_paths(start, end)) == []
+
+
+def test_nodes_missing_from_node_list_get_defaults(graph_service):
+    # 'assurance-service' is only referenced by edges in train-ticket.json
+    expected = {'name': 'assurance-service', 'kind': 'service', 'publicExposed': False}
+    assert graph_service.get_node_data('assurance-service') == expected
+    assert graph_service.graph.nodes['assurance-service'] == expected
+
+
+def test_reach_bits_match_descendants(graph_service):
+    nodes = graph_service.get_all_nodes()
+    all_ends = graph_service.end_mask(nodes)
+    for start in nodes:
+        descendants = nx.descendants(graph_service.graph, start)
+        for end in nodes:
+            if end != start:
+                assert graph_service.is_reachable(start, end) == (end in descendants)
+        assert set(graph_service.candidate_ends(start, all_ends)) == descendants | {start}
+
+
+def test_reach_bits_with_cycles_and_multiple_words(make_graph_service):
+    # A 70-node chain spans two bitset words; the back edge makes a cycle
+    nodes, edges = chain(70)
+    edges.append({"from": "service-65", "to": "service-60"})
+    gs = make_graph_service(nodes, edges)
+    names = [node["name"] for node in nodes]
+    for start in names:
+        descendants = nx.descendants(gs.graph, start)
+        for end in names:
+            if end != start:
+                assert gs.is_reachable(start, end) == (end in descendants)
+
+
+def test_default_cutoff_is_longest_path_for_dag(graph_service):
+    assert nx.is_directed_acyclic_graph(graph_service.graph)
+    expected = min(DEFAULT_CUTOFF, nx.dag_longest_path_length(graph_service.graph))
+    assert graph_service.default_cutoff == expected
+
+
+def test_default_cutoff_never_exceeds_fixed_bound(make_graph_service):
+    # A 15-edge chain is a DAG whose longest path exceeds DEFAULT_CUTOFF
+    gs = make_graph_service(*chain(16))
+    assert gs.default_cutoff == DEFAULT_CUTOFF
+    assert list(gs.get_simple_paths('service-0', 'service-15')) == []
+
+
+def test_get_simple_paths_with_mask(graph_service):
+    nodes = graph_service.get_all_nodes()
+    pairs = [(start, end) for start in nodes for end in nodes
+             if len(list(graph_service.get_simple_paths(start, end))) > 1]
+    assert pairs
+    start, end = pairs[0]
+    # Longer paths visit nodes outside the shortest one
+    shortest = min(graph_service.get_simple_paths(start, end), key=len)
+    mask = graph_service.node_mask(shortest)
+    assert list(graph_service.get_simple_paths(start, end, mask=mask)) == [shortest]